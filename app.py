@@ -1,14 +1,14 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File, Depends
-from fastapi.responses import JSONResponse
-from sqlalchemy import create_engine, Column, String, JSON, DateTime, text
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from sqlalchemy import create_engine, event, Column, String, Text, DateTime, text, select, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.pool import NullPool, QueuePool
+from sqlalchemy.pool import NullPool, QueuePool, AsyncAdaptedQueuePool
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
-import json
-import geojson
+import orjson
+import ijson
 from datetime import datetime
 import os
 import tempfile
@@ -17,9 +17,14 @@ import re
 import sqlite3
 import asyncio
 from functools import lru_cache
+from itertools import islice
 
-# Create FastAPI app
-app = FastAPI(title="BlitzFind API", description="Simple key-value query system with GeoJSON support")
+# Create FastAPI app (responses are serialized with orjson instead of stdlib json)
+app = FastAPI(
+    title="BlitzFind API",
+    description="Simple key-value query system with GeoJSON support",
+    default_response_class=ORJSONResponse
+)
 
 # Database setup
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./blitzfind.db")
@@ -31,17 +36,50 @@ if DATABASE_URL.startswith("sqlite"):
 else:
     ASYNC_DATABASE_URL = DATABASE_URL
 
+# Dialect-specific INSERT that supports ON CONFLICT ... DO UPDATE for bulk upserts
+if DATABASE_URL.startswith("sqlite"):
+    from sqlalchemy.dialects.sqlite import insert as upsert_insert
+else:
+    from sqlalchemy.dialects.postgresql import insert as upsert_insert
+
 # Create both sync and async engines (we'll migrate gradually)
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {})
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
+    pool_size=20,  # Match the async engine so concurrent requests don't queue for a session
+    max_overflow=40
+)
 async_engine = create_async_engine(
     ASYNC_DATABASE_URL,
     connect_args={"check_same_thread": False} if ASYNC_DATABASE_URL.startswith("sqlite") else {},
+    poolclass=AsyncAdaptedQueuePool,  # aiosqlite otherwise defaults to NullPool, which rejects pool sizing
     pool_size=20,  # Increase pool size for better concurrency
     max_overflow=40,  # Allow more overflow connections
     pool_pre_ping=True,  # Verify connections before use
     pool_recycle=3600  # Recycle connections after 1 hour
 )
 
+# Per-connection SQLite tuning: WAL lets readers run alongside the import writer,
+# and synchronous=NORMAL avoids an fsync on every commit (safe in WAL mode)
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",  # 64 MB page cache
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",  # 256 MB memory-mapped I/O
+)
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply SQLITE_PRAGMAS to every new DBAPI connection"""
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+if DATABASE_URL.startswith("sqlite"):
+    event.listen(engine, "connect", set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
 Base = declarative_base()
@@ -51,7 +89,7 @@ class KeyValueStore(Base):
     __tablename__ = "key_value_store"
     
     id = Column(String, primary_key=True, index=True)
-    value = Column(JSON)
+    value = Column(Text)  # Serialized JSON, passed through to responses without re-parsing
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -95,19 +133,88 @@ def get_db():
     finally:
         db.close()
 
+def raw_json(value: Any):
+    """
+    Wrap a stored JSON string so orjson embeds it in a response as-is.
+    
+    Tables created before value became a text column keep PostgreSQL's json type,
+    which the driver returns already decoded; those values are passed through for
+    orjson to serialize normally.
+    """
+    if isinstance(value, (str, bytes)):
+        return orjson.Fragment(value)
+    return value
+
+# Bulk import helpers
+# Ids per IN (...) lookup; stays under SQLITE_LIMIT_VARIABLE_NUMBER (999 on older builds)
+EXISTING_IDS_CHUNK_SIZE = 900
+
+# SQL for a feature's properties.name; must match the index expression in ensure_indexes.py
+if DATABASE_URL.startswith("sqlite"):
+    PROPERTY_NAME_SQL = "json_extract(value, '$.properties.name')"
+else:
+    PROPERTY_NAME_SQL = "((value::jsonb) #>> '{properties,name}')"
+
+# Rows per UPSERT batch (and per fetchmany from an uploaded SpatiaLite database)
+IMPORT_BATCH_SIZE = 5000
+
+# Uploads are copied to disk in chunks of this size
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MB
+
+def existing_ids(conn, ids: List[str]) -> set:
+    """Return the subset of ids that already exist in the key-value store"""
+    found = set()
+    for i in range(0, len(ids), EXISTING_IDS_CHUNK_SIZE):
+        chunk = ids[i:i + EXISTING_IDS_CHUNK_SIZE]
+        result = conn.execute(select(KeyValueStore.id).where(KeyValueStore.id.in_(chunk)))
+        found.update(row[0] for row in result)
+    return found
+
+def bulk_upsert(conn, rows: List[Dict[str, Any]]):
+    """Insert or update many records with a single executemany'd UPSERT statement"""
+    if not rows:
+        return
+    stmt = upsert_insert(KeyValueStore.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['id'],
+        set_={'value': stmt.excluded.value, 'updated_at': stmt.excluded.updated_at}
+    )
+    conn.execute(stmt, rows)
+
+# Rows SQLite samples per index when analyzing after an import; a full ANALYZE
+# scans the whole table and every index, which costs more than small imports
+SQLITE_ANALYSIS_LIMIT = 1000
+
+def analyze_key_value_store():
+    """Refresh planner statistics after a bulk import so the indexes get picked"""
+    with engine.begin() as conn:
+        if DATABASE_URL.startswith("sqlite"):
+            # Approximate statistics from a bounded sample; cost no longer grows with the table
+            conn.execute(text(f"PRAGMA analysis_limit={SQLITE_ANALYSIS_LIMIT}"))
+        # PostgreSQL's ANALYZE already works from a fixed-size row sample
+        conn.execute(text("ANALYZE key_value_store"))
+
+def upsert_batch(conn, rows: Dict[str, Dict[str, Any]]) -> int:
+    """Bulk-upsert a batch of rows keyed by id and return how many ids already existed"""
+    existing_count = len(existing_ids(conn, list(rows)))
+    bulk_upsert(conn, list(rows.values()))
+    return existing_count
+
 # Async dependency to get DB session
 async def get_async_db():
     async with AsyncSessionLocal() as session:
         yield session
 
-# Simple in-memory cache for frequently accessed data
+# Simple in-memory LRU cache for frequently accessed data
 # Cache will store up to 1000 items for 5 minutes
+from collections import OrderedDict
 from datetime import timedelta
 from typing import Tuple
 
 class SimpleCache:
     def __init__(self, max_size: int = 1000, ttl_minutes: int = 5):
-        self.cache: Dict[str, Tuple[Any, datetime]] = {}
+        # Ordered from least to most recently used
+        self.cache: "OrderedDict[str, Tuple[Any, datetime]]" = OrderedDict()
         self.max_size = max_size
         self.ttl = timedelta(minutes=ttl_minutes)
     
@@ -115,31 +222,76 @@ class SimpleCache:
         if key in self.cache:
             value, timestamp = self.cache[key]
             if datetime.utcnow() - timestamp < self.ttl:
+                self.cache.move_to_end(key)
                 return value
             else:
                 del self.cache[key]
         return None
     
     def set(self, key: str, value: Any):
-        # Simple LRU: if cache is full, remove oldest entry
-        if len(self.cache) >= self.max_size:
-            oldest_key = min(self.cache.keys(), key=lambda k: self.cache[k][1])
-            del self.cache[oldest_key]
+        # LRU: if cache is full, evict the least recently used entry in O(1)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+        elif len(self.cache) >= self.max_size:
+            self.cache.popitem(last=False)
         self.cache[key] = (value, datetime.utcnow())
     
     def invalidate(self, key: str):
         if key in self.cache:
             del self.cache[key]
+    
+    def clear(self):
+        self.cache.clear()
 
 # Initialize cache
 data_cache = SimpleCache(max_size=1000, ttl_minutes=5)
 
+# Serialized /query/{id} responses for hot ids, dropped whenever the id is written
+query_cache = SimpleCache(max_size=10000, ttl_minutes=5)
+
+# Row count for list pagination; COUNT(*) scans the table in SQLite, so reuse it
+# for a minute and drop it whenever rows are added or deleted
+count_cache = SimpleCache(max_size=1, ttl_minutes=1)
+
+def invalidate_import_caches():
+    """Drop cached responses after a bulk import, which may have rewritten any id"""
+    data_cache.clear()
+    query_cache.clear()
+    count_cache.invalidate("count")
+
 # API endpoints
 @app.get("/", tags=["Health"])
 async def root():
     """Health check endpoint"""
     return {"message": "BlitzFind API is running", "version": "1.0.0"}
 
+def geojson_header(fileobj) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Return the top-level "type" value and the ijson event that opens "features".
+    
+    Parsing stops as soon as both are seen, so the features themselves are not read
+    (unless "type" comes after them).
+    """
+    geojson_type = None
+    features_event = None
+    for prefix, event, value in ijson.parse(fileobj):
+        if prefix == "type" and event == "string":
+            geojson_type = value
+        elif prefix == "features" and features_event is None:
+            features_event = event
+        if geojson_type is not None and features_event is not None:
+            break
+    return geojson_type, features_event
+
+def geojson_feature_id(feature: Dict[str, Any], _str=str) -> Optional[str]:
+    """Return the feature's id, falling back to properties.id, or None if it has neither"""
+    feature_id = feature.get("id")
+    if feature_id:
+        return _str(feature_id)
+    properties = feature.get("properties") or {}
+    feature_id = properties.get("id")
+    return _str(feature_id) if feature_id is not None else None
+
 @app.post("/import/geojson", tags=["Import"])
 async def import_geojson(file: UploadFile = File(...)):
     """
@@ -150,60 +302,158 @@ async def import_geojson(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="File must be a GeoJSON file")
     
     try:
-        # Read and parse the GeoJSON file
-        content = await file.read()
-        data = geojson.loads(content.decode('utf-8'))
-        
-        if not isinstance(data, geojson.FeatureCollection):
+        # Validate the document structure before streaming the features
+        geojson_type, features_event = geojson_header(file.file)
+        if geojson_type != "FeatureCollection":
             raise HTTPException(status_code=400, detail="Invalid GeoJSON: must be a FeatureCollection")
+        if features_event != "start_array":
+            raise HTTPException(status_code=400, detail="Invalid GeoJSON: 'features' must be a list")
+        file.file.seek(0)
         
-        db = next(get_db())
+        now = datetime.utcnow()
         imported_count = 0
         updated_count = 0
+        total_features = 0
         
-        # Import each feature
-        for feature in data.features:
-            # Use feature id or generate one from properties
-            feature_id = None
-            if hasattr(feature, 'id') and feature.id:
-                feature_id = str(feature.id)
-            elif feature.properties and 'id' in feature.properties:
-                feature_id = str(feature.properties['id'])
-            else:
-                # Skip features without ID
-                continue
-            
-            # Check if record exists
-            existing = db.query(KeyValueStore).filter(KeyValueStore.id == feature_id).first()
-            
-            if existing:
-                # Update existing record
-                existing.value = feature
-                existing.updated_at = datetime.utcnow()
-                updated_count += 1
-            else:
-                # Create new record
-                new_record = KeyValueStore(
-                    id=feature_id,
-                    value=feature
-                )
-                db.add(new_record)
-                imported_count += 1
-        
-        db.commit()
+        # Stream features from the upload and upsert them in batches, all in one transaction
+        features = ijson.items(file.file, "features.item", use_float=True)
+        dumps = orjson.dumps
+        with engine.begin() as conn:
+            while batch := list(islice(features, IMPORT_BATCH_SIZE)):
+                total_features += len(batch)
+                # Skip features without an id; keyed by id so duplicates keep the last occurrence
+                rows = {
+                    feature_id: {"id": feature_id, "value": dumps(feature).decode(), "created_at": now, "updated_at": now}
+                    for feature in batch
+                    if (feature_id := geojson_feature_id(feature)) is not None
+                }
+                existing_count = upsert_batch(conn, rows)
+                updated_count += existing_count
+                imported_count += len(rows) - existing_count
+        invalidate_import_caches()
+        analyze_key_value_store()
         
         return {
             "message": "GeoJSON imported successfully",
             "imported": imported_count,
             "updated": updated_count,
-            "total_features": len(data.features)
+            "total_features": total_features
         }
         
-    except geojson.GeoJSONError as e:
+    except HTTPException:
+        raise
+    except ijson.JSONError as e:
         raise HTTPException(status_code=400, detail=f"Invalid GeoJSON: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error importing file: {str(e)}")
 
+# Allowed table/column names for SpatiaLite imports
+IDENTIFIER_PATTERN = re.compile(r'[A-Za-z_][A-Za-z0-9_]{0,63}')
+
+def quote_identifier(name: str) -> str:
+    """Double-quote an SQLite identifier read from the file itself (e.g. a property column)"""
+    return '"' + name.replace('"', '""') + '"'
+
+# Candidate locations of the SpatiaLite extension, tried in order
+SPATIALITE_EXTENSION_PATHS = (
+    'mod_spatialite',  # Default
+    '/opt/homebrew/lib/mod_spatialite',  # Homebrew on macOS ARM
+    '/usr/local/lib/mod_spatialite',  # Homebrew on macOS Intel
+    '/usr/lib/x86_64-linux-gnu/mod_spatialite',  # Ubuntu/Debian
+    '/usr/lib64/mod_spatialite',  # RHEL/CentOS
+)
+
+def find_spatialite_path() -> Optional[str]:
+    """Return the first SpatiaLite extension path that loads, or None if none do"""
+    probe = sqlite3.connect(":memory:")
+    try:
+        probe.enable_load_extension(True)
+        for ext_path in SPATIALITE_EXTENSION_PATHS:
+            try:
+                probe.execute("SELECT load_extension(?)", (ext_path,))
+                print(f"Found SpatiaLite extension at: {ext_path}")
+                return ext_path
+            except sqlite3.OperationalError:
+                continue
+    except AttributeError:
+        # Python's sqlite3 was built without extension loading support
+        pass
+    finally:
+        probe.close()
+    return None
+
+# Probed once at import instead of on every SpatiaLite upload
+SPATIALITE_PATH = find_spatialite_path()
+
+# WKT point, e.g. "POINT Z (116.42115915 39.98681646 13.26017761)"
+POINT_WKT_PATTERN = re.compile(r'POINT\s*(?:Z\s*)?\(([\d.\s-]+)\)')
+POINT_WKT_CHARS = frozenset("0123456789. \t\r\n-")
+
+def parse_point_wkt(wkt: str) -> Optional[List[float]]:
+    """Parse a WKT POINT into [x, y] or [x, y, z], or return None if it isn't one"""
+    coords = None
+    open_paren = wkt.find("(")
+    if wkt.startswith("POINT") and wkt[5:open_paren].strip() in ("", "Z"):
+        # Fast path: slice out the text between the parentheses without a regex.
+        # Only the regex's characters are allowed, since float() would also take
+        # "nan", "inf", "+1" and exponents.
+        body = wkt[open_paren + 1:wkt.rfind(")")]
+        if POINT_WKT_CHARS.issuperset(body):
+            try:
+                coords = [float(c) for c in body.split()]
+            except ValueError:
+                coords = None
+    if coords is None:
+        match = POINT_WKT_PATTERN.search(wkt)
+        if not match:
+            return None
+        coords = [float(c) for c in match.group(1).split()]
+    # Keep x, y and Z if present
+    return coords[:3] if len(coords) >= 2 else None
+
+def spatialite_row_to_feature(row: Tuple[Any, ...], columns: List[str], is_spatialite: bool = False) -> Dict[str, Any]:
+    """
+    Build a GeoJSON feature from a SpatiaLite/SQLite row tuple.
+    
+    row is (id, geometry_json, *property columns) and columns holds the matching names
+    from cursor.description. With SpatiaLite loaded, geometry_json was rendered by
+    AsGeoJSON (including the centre_point fallback), so it is embedded as-is
+    instead of being parsed.
+    """
+    feature_id = str(row[0])
+    
+    # Parse geometry; sqlite3 only returns str/bytes/numbers/None, never dicts
+    geometry_data = row[1]
+    if geometry_data and is_spatialite:
+        geometry = orjson.Fragment(geometry_data)
+    else:
+        try:
+            geometry = orjson.loads(geometry_data) if geometry_data else None
+        except (orjson.JSONDecodeError, TypeError):
+            # If it's not valid JSON, skip this geometry
+            geometry = None
+    
+    # Special columns are already left out of the SELECT, so only drop NULLs
+    properties = {k: v for k, v in zip(columns[2:], row[2:]) if v is not None}
+    
+    # If geometry is still null, try to use centre_point as fallback
+    if geometry is None and not is_spatialite:
+        centre_point = properties.get('centre_point')
+        if centre_point and isinstance(centre_point, str):
+            coordinates = parse_point_wkt(centre_point)
+            if coordinates:
+                geometry = {"type": "Point", "coordinates": coordinates}
+    
+    # Create GeoJSON feature
+    feature = {
+        "type": "Feature",
+        "id": feature_id,
+        "geometry": geometry,
+        "properties": properties
+    }
+    
+    return feature
+
 @app.post("/import/spatialite", tags=["Import"])
 async def import_spatialite(
     file: UploadFile = File(...),
@@ -223,22 +473,35 @@ async def import_spatialite(
     if not file.filename.endswith('.sqlite') and not file.filename.endswith('.db') and not file.filename.endswith('.spatialite'):
         raise HTTPException(status_code=400, detail="File must be a SpatiaLite database file (.sqlite, .db, or .spatialite)")
     
+    # Identifiers are interpolated into the SQL, so only accept plain names (and quote them)
+    for param, identifier in (("table_name", table_name), ("id_column", id_column), ("geom_column", geom_column)):
+        if not IDENTIFIER_PATTERN.fullmatch(identifier):
+            raise HTTPException(status_code=400, detail=f"Invalid {param}: '{identifier}'")
+    
     # Create a temporary file to store the uploaded database
     with tempfile.NamedTemporaryFile(delete=False, suffix='.sqlite') as tmp_file:
         try:
-            # Write uploaded file to temporary location
-            content = await file.read()
-            tmp_file.write(content)
+            # Copy the upload to the temporary location without holding it all in memory
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                tmp_file.write(chunk)
             tmp_file.flush()
             
             # Connect to the SpatiaLite database using sqlite3
             conn = sqlite3.connect(tmp_file.name)
-            conn.row_factory = sqlite3.Row  # This allows column access by name
             cursor = conn.cursor()
             
-            db = next(get_db())
-            imported_count = 0
-            updated_count = 0
+            now = datetime.utcnow()
+            
+            # Make sure the table and columns exist; SQLite would otherwise read an
+            # unknown double-quoted identifier as a string literal
+            cursor.execute(f'PRAGMA table_info("{table_name}")')
+            table_columns = [column[1] for column in cursor.fetchall()]
+            columns = set(table_columns)
+            if not columns:
+                raise HTTPException(status_code=400, detail=f"Table '{table_name}' not found")
+            for column in (id_column, geom_column):
+                if column not in columns:
+                    raise HTTPException(status_code=400, detail=f"Column '{column}' not found in table '{table_name}'")
             
             # Check if it's a SpatiaLite database
             is_spatialite = False
@@ -251,125 +514,64 @@ async def import_spatialite(
             
             # Build the query based on whether it's SpatiaLite or regular SQLite
             if is_spatialite:
-                # Try to load SpatiaLite extension from various paths
+                # Load SpatiaLite from the path resolved at startup
                 spatialite_loaded = False
-                extension_paths = [
-                    'mod_spatialite',  # Default
-                    '/opt/homebrew/lib/mod_spatialite',  # Homebrew on macOS ARM
-                    '/usr/local/lib/mod_spatialite',  # Homebrew on macOS Intel
-                    '/usr/lib/x86_64-linux-gnu/mod_spatialite',  # Ubuntu/Debian
-                    '/usr/lib64/mod_spatialite',  # RHEL/CentOS
-                ]
-                
-                # Enable extension loading
-                conn.enable_load_extension(True)
-                
-                for ext_path in extension_paths:
-                    try:
-                        cursor.execute(f"SELECT load_extension('{ext_path}')")
-                        spatialite_loaded = True
-                        print(f"Successfully loaded SpatiaLite from: {ext_path}")
-                        break
-                    except Exception as e:
-                        continue
+                if SPATIALITE_PATH:
+                    conn.enable_load_extension(True)
+                    cursor.execute("SELECT load_extension(?)", (SPATIALITE_PATH,))
+                    spatialite_loaded = True
                 
                 if spatialite_loaded:
-                    # Use AsGeoJSON for SpatiaLite
-                    query = f"""
-                        SELECT 
-                            {id_column} as id,
-                            AsGeoJSON({geom_column}) as geometry_json,
-                            *
-                        FROM {table_name}
-                        WHERE {id_column} IS NOT NULL
-                    """
+                    # Use AsGeoJSON for SpatiaLite, falling back to the centre_point
+                    # WKT inside SQLite rather than parsing it per row in Python
+                    if "centre_point" in columns:
+                        geometry_expr = f'COALESCE(AsGeoJSON("{geom_column}"), AsGeoJSON(GeomFromText(centre_point)))'
+                    else:
+                        geometry_expr = f'AsGeoJSON("{geom_column}")'
                 else:
                     # If extension loading fails, treat as regular SQLite
                     is_spatialite = False
-                    print("Failed to load SpatiaLite extension from any known path")
+                    print("SpatiaLite extension is not available from any known path")
             
             if not is_spatialite:
                 # For regular SQLite, assume geometry is already stored as GeoJSON string
-                query = f"""
-                    SELECT 
-                        {id_column} as id,
-                        {geom_column} as geometry_json,
-                        *
-                    FROM {table_name}
-                    WHERE {id_column} IS NOT NULL
-                """
+                geometry_expr = f'"{geom_column}"'
+            
+            # List the property columns explicitly; with * the raw geometry column
+            # would be fetched a second time only to be dropped in Python
+            property_columns = [c for c in table_columns if c not in ('id', 'geometry_json', geom_column)]
+            query = f"""
+                SELECT 
+                    "{id_column}" as id,
+                    {geometry_expr} as geometry_json
+                    {"".join(", " + quote_identifier(c) for c in property_columns)}
+                FROM "{table_name}"
+                WHERE "{id_column}" IS NOT NULL
+            """
             
             # Execute query
             cursor.execute(query)
+            result_columns = [description[0] for description in cursor.description]
             
-            # Process each row
-            for row in cursor:
-                # Convert sqlite3.Row to dict
-                row_dict = dict(row)
-                feature_id = str(row_dict['id'])
-                
-                # Parse geometry
-                geometry = None
-                geometry_data = row_dict.get('geometry_json')
-                
-                if geometry_data:
-                    if isinstance(geometry_data, str):
-                        try:
-                            # Try to parse as JSON
-                            geometry = json.loads(geometry_data)
-                        except json.JSONDecodeError:
-                            # If it's not valid JSON, skip this geometry
-                            geometry = None
-                    elif isinstance(geometry_data, dict):
-                        geometry = geometry_data
-                
-                # If geometry is still null, try to use centre_point as fallback
-                if geometry is None and 'centre_point' in row_dict:
-                    centre_point = row_dict.get('centre_point')
-                    if centre_point and isinstance(centre_point, str):
-                        # Parse WKT format (e.g., "POINT Z (116.42115915 39.98681646 13.26017761)")
-                        match = re.search(r'POINT\s*(?:Z\s*)?\(([\d.\s-]+)\)', centre_point)
-                        if match:
-                            coords = match.group(1).split()
-                            if len(coords) >= 2:
-                                geometry = {
-                                    "type": "Point",
-                                    "coordinates": [float(coords[0]), float(coords[1])]
-                                }
-                                # Add Z coordinate if present
-                                if len(coords) >= 3:
-                                    geometry["coordinates"].append(float(coords[2]))
-                
-                # Remove special columns from properties
-                properties = {k: v for k, v in row_dict.items() 
-                            if k not in ['id', 'geometry_json', geom_column] and v is not None}
-                
-                # Create GeoJSON feature
-                feature = {
-                    "type": "Feature",
-                    "id": feature_id,
-                    "geometry": geometry,
-                    "properties": properties
-                }
-                
-                # Check if record exists
-                existing = db.query(KeyValueStore).filter(KeyValueStore.id == feature_id).first()
-                
-                if existing:
-                    # Update existing record
-                    existing.value = feature
-                    existing.updated_at = datetime.utcnow()
-                    updated_count += 1
-                else:
-                    # Create new record
-                    new_record = KeyValueStore(
-                        id=feature_id,
-                        value=feature
-                    )
-                    db.add(new_record)
-                    imported_count += 1
-            
-            db.commit()
+            # Stream rows in batches and upsert each batch, all in one transaction
+            imported_count = 0
+            updated_count = 0
+            with engine.begin() as db_conn:
+                while True:
+                    batch = cursor.fetchmany(IMPORT_BATCH_SIZE)
+                    if not batch:
+                        break
+                    
+                    rows = {}
+                    for row in batch:
+                        feature = spatialite_row_to_feature(row, result_columns, is_spatialite)
+                        rows[feature["id"]] = {"id": feature["id"], "value": orjson.dumps(feature).decode(), "created_at": now, "updated_at": now}
+                    
+                    existing_count = upsert_batch(db_conn, rows)
+                    updated_count += existing_count
+                    imported_count += len(rows) - existing_count
+            invalidate_import_caches()
+            analyze_key_value_store()
             
             # Close the sqlite3 connection
             conn.close()
@@ -383,6 +585,8 @@ async def import_spatialite(
                 "spatialite_detected": is_spatialite
             }
             
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error importing SpatiaLite file: {str(e)}")
         finally:
@@ -391,59 +595,80 @@ async def import_spatialite(
                 os.unlink(tmp_file.name)
 
 @app.post("/data", tags=["Data"])
-async def create_key_value(data: KeyValueCreate):
+async def create_key_value(data: KeyValueCreate, db: Session = Depends(get_db)):
     """Create or update a key-value pair"""
-    db = next(get_db())
-    
     # Check if key exists
     existing = db.query(KeyValueStore).filter(KeyValueStore.id == data.id).first()
     
+    # Timestamps are set here and echoed back, so no refresh SELECT is needed after commit.
+    # The response is built from already-validated input, so it skips model validation.
+    now = datetime.utcnow()
+    
     if existing:
-        # Update existing
-        existing.value = data.value
-        existing.updated_at = datetime.utcnow()
+        # Update existing (read created_at before commit expires the instance)
+        created_at = existing.created_at
+        existing.value = orjson.dumps(data.value).decode()
+        existing.updated_at = now
         db.commit()
-        db.refresh(existing)
         # Invalidate cache for updated data
         data_cache.invalidate(f"data:{data.id}")
-        return KeyValueResponse(
-            id=existing.id,
-            value=existing.value,
-            created_at=existing.created_at,
-            updated_at=existing.updated_at
+        query_cache.invalidate(f"query:{data.id}")
+        return KeyValueResponse.model_construct(
+            id=data.id,
+            value=data.value,
+            created_at=created_at,
+            updated_at=now
         )
     else:
         # Create new
-        new_record = KeyValueStore(id=data.id, value=data.value)
+        new_record = KeyValueStore(
+            id=data.id,
+            value=orjson.dumps(data.value).decode(),
+            created_at=now,
+            updated_at=now
+        )
         db.add(new_record)
         db.commit()
-        db.refresh(new_record)
-        # No need to invalidate cache for new records
-        return KeyValueResponse(
-            id=new_record.id,
-            value=new_record.value,
-            created_at=new_record.created_at,
-            updated_at=new_record.updated_at
+        # No need to invalidate the data cache for new records, only the row count
+        count_cache.invalidate("count")
+        return KeyValueResponse.model_construct(
+            id=data.id,
+            value=data.value,
+            created_at=now,
+            updated_at=now
         )
 
 @app.get("/query/{id}", tags=["Query"])
-async def query_by_id(id: str):
+async def query_by_id(id: str, db: Session = Depends(get_db)):
     """Query value by ID"""
-    db = next(get_db())
-    record = db.query(KeyValueStore).filter(KeyValueStore.id == id).first()
+    # Hits are served straight from the cached response bytes
+    cached_body = query_cache.get(f"query:{id}")
+    if cached_body is not None:
+        return Response(content=cached_body, media_type="application/json")
+    
+    # Only the serialized value is needed; it is embedded in the response unparsed
+    record = db.execute(select(KeyValueStore.value).where(KeyValueStore.id == id)).first()
     
     if record:
-        return QueryResponse(
-            found=True,
-            id=record.id,
-            value=record.value
-        )
+        body = orjson.dumps({"found": True, "id": id, "value": raw_json(record.value)})
+        query_cache.set(f"query:{id}", body)
+        return Response(content=body, media_type="application/json")
     else:
-        return QueryResponse(
-            found=False,
-            id=id,
-            value=None
-        )
+        return ORJSONResponse(content={"found": False, "id": id, "value": None})
+
+@app.get("/query_by_prop", tags=["Query"])
+async def query_by_prop(name: str, limit: int = 100, db: Session = Depends(get_db)):
+    """Query values whose properties.name matches, using the JSON expression index"""
+    records = db.execute(
+        text(f"SELECT id, value FROM key_value_store WHERE {PROPERTY_NAME_SQL} = :name LIMIT :limit"),
+        {"name": name, "limit": limit}
+    ).all()
+    
+    return ORJSONResponse(content={
+        "name": name,
+        "count": len(records),
+        "data": [{"id": record.id, "value": raw_json(record.value)} for record in records]
+    })
 
 @app.get("/data/{id}", tags=["Data"])
 async def get_key_value(id: str, db: AsyncSession = Depends(get_async_db)):
@@ -451,11 +676,7 @@ async def get_key_value(id: str, db: AsyncSession = Depends(get_async_db)):
     # Check cache first
     cached_result = data_cache.get(f"data:{id}")
     if cached_result:
-        return cached_result
-    
-    # Use async query with proper imports
-    from sqlalchemy import select
-    from sqlalchemy.ext.asyncio import AsyncSession
+        return ORJSONResponse(content=cached_result)
     
     # Execute async query
     result = await db.execute(
@@ -466,22 +687,22 @@ async def get_key_value(id: str, db: AsyncSession = Depends(get_async_db)):
     if not record:
         raise HTTPException(status_code=404, detail=f"ID '{id}' not found")
     
-    response = KeyValueResponse(
-        id=record.id,
-        value=record.value,
-        created_at=record.created_at,
-        updated_at=record.updated_at
-    )
+    # Pre-shaped dict; orjson serializes the datetimes natively
+    response = {
+        "id": record.id,
+        "value": raw_json(record.value),
+        "created_at": record.created_at,
+        "updated_at": record.updated_at
+    }
     
     # Cache the result
     data_cache.set(f"data:{id}", response)
     
-    return response
+    return ORJSONResponse(content=response)
 
 @app.delete("/data/{id}", tags=["Data"])
-async def delete_key_value(id: str):
+async def delete_key_value(id: str, db: Session = Depends(get_db)):
     """Delete a key-value pair by ID"""
-    db = next(get_db())
     record = db.query(KeyValueStore).filter(KeyValueStore.id == id).first()
     
     if not record:
@@ -492,15 +713,25 @@ async def delete_key_value(id: str):
     
     # Invalidate cache
     data_cache.invalidate(f"data:{id}")
+    query_cache.invalidate(f"query:{id}")
+    count_cache.invalidate("count")
     
     return {"message": f"ID '{id}' deleted successfully"}
 
 @app.get("/data", tags=["Data"])
-async def list_keys(skip: int = 0, limit: int = 100):
+async def list_keys(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """List all keys with pagination"""
-    db = next(get_db())
-    total = db.query(KeyValueStore).count()
-    records = db.query(KeyValueStore).offset(skip).limit(limit).all()
+    total = count_cache.get("count")
+    if total is None:
+        total = db.scalar(select(func.count()).select_from(KeyValueStore))
+        count_cache.set("count", total)
+    
+    # Project only the listed columns so the (potentially large) value column is never read
+    records = db.execute(
+        select(KeyValueStore.id, KeyValueStore.created_at, KeyValueStore.updated_at)
+        .offset(skip)
+        .limit(limit)
+    ).mappings().all()
     
     return {
         "total": total,
@@ -508,14 +739,34 @@ async def list_keys(skip: int = 0, limit: int = 100):
         "limit": limit,
         "data": [
             {
-                "id": record.id,
-                "created_at": record.created_at,
-                "updated_at": record.updated_at
+                "id": record["id"],
+                "created_at": record["created_at"],
+                "updated_at": record["updated_at"]
             }
             for record in records
         ]
     }
 
+# Rows fetched per round-trip while streaming an export
+EXPORT_BATCH_SIZE = 1000
+
+@app.get("/export", tags=["Data"])
+async def export_data():
+    """Stream all key-value pairs as one JSON document without loading the table into memory"""
+    def generate():
+        yield b'{"data":['
+        separator = b""
+        with engine.connect().execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE) as conn:
+            result = conn.execute(select(KeyValueStore.id, KeyValueStore.value))
+            for partition in result.partitions():
+                yield separator + b",".join(
+                    orjson.dumps({"id": row.id, "value": raw_json(row.value)}) for row in partition
+                )
+                separator = b","
+        yield b"]}"
+    
+    return StreamingResponse(generate(), media_type="application/json")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -5,24 +5,123 @@ BlitzFind CLI - Command line interface for BlitzFind API
 
 import argparse
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import ijson
 import json
 import sys
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+from typing import Optional, Tuple
+
+def geojson_header(fileobj) -> Tuple[Optional[str], Optional[str]]:
+    """Return the top-level "type" value and the ijson event that opens "features" (as the server checks them)"""
+    geojson_type = None
+    features_event = None
+    for prefix, event, value in ijson.parse(fileobj):
+        if prefix == "type" and event == "string":
+            geojson_type = value
+        elif prefix == "features" and features_event is None:
+            features_event = event
+        if geojson_type is not None and features_event is not None:
+            break
+    return geojson_type, features_event
 
 class BlitzFindCLI:
     def __init__(self, base_url: str = "http://localhost:8000"):
         self.base_url = base_url
-    
-    def import_geojson(self, filepath: str) -> dict:
-        """Import GeoJSON file to the database"""
+        # One pooled keep-alive session for all calls instead of a new connection per request
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=20,
+            max_retries=Retry(total=3, backoff_factor=0.1)
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+    
+    def import_geojson(self, filepath: str, chunk_size: int = 10000, workers: int = 4) -> dict:
+        """
+        Import GeoJSON file to the database, uploading its features in concurrent chunks.
+        
+        Each chunk is committed by the server on its own, so on failure the result
+        still carries the totals of the chunks that were imported and the 0-based
+        indexes of the chunks that failed.
+        """
+        totals = {"imported": 0, "updated": 0, "total_features": 0, "chunks": 0}
+        failed_chunks = []
+        errors = []
         try:
             with open(filepath, 'rb') as f:
-                files = {'file': (filepath, f, 'application/geo+json')}
-                response = requests.post(f"{self.base_url}/import/geojson", files=files)
-                response.raise_for_status()
-                return response.json()
+                # Only split real FeatureCollections; anything else is sent as-is so
+                # the server's own validation applies and reports the problem
+                geojson_type, features_event = geojson_header(f)
+                if geojson_type != "FeatureCollection" or features_event != "start_array":
+                    return self._upload_file(filepath)
+                f.seek(0)
+                
+                # Stream features from the file and keep at most `workers` uploads in flight
+                features = ijson.items(f, "features.item", use_float=True)
+                pending = {}
+                
+                def collect(done):
+                    for future in done:
+                        index = pending.pop(future)
+                        try:
+                            self._add_import_result(totals, future.result())
+                        except Exception as e:
+                            failed_chunks.append(index)
+                            errors.append(f"chunk {index}: {e}")
+                
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    try:
+                        index = 0
+                        while chunk := list(islice(features, chunk_size)):
+                            if len(pending) >= workers:
+                                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                            pending[executor.submit(self._upload_features, filepath, chunk)] = index
+                            index += 1
+                    finally:
+                        # Count every upload already sent, even if reading the file failed
+                        collect(wait(pending).done)
+            
+            if failed_chunks:
+                return {
+                    "error": f"{len(failed_chunks)} chunk(s) failed; {errors[0]}",
+                    "failed_chunks": sorted(failed_chunks),
+                    **totals
+                }
+            
+            if totals["chunks"] == 0:
+                # No features found; send the file as-is so the server validates it
+                return self._upload_file(filepath)
+            
+            return {"message": "GeoJSON imported successfully", **totals}
         except Exception as e:
-            return {"error": str(e)}
+            return {"error": str(e), "failed_chunks": sorted(failed_chunks), **totals}
+    
+    def _upload_file(self, filepath: str) -> dict:
+        """Upload a GeoJSON file unchanged in a single request"""
+        with open(filepath, 'rb') as f:
+            files = {'file': (filepath, f, 'application/geo+json')}
+            response = self.session.post(f"{self.base_url}/import/geojson", files=files)
+            response.raise_for_status()
+            return response.json()
+    
+    def _upload_features(self, filepath: str, features: list) -> dict:
+        """Upload one chunk of features as its own FeatureCollection"""
+        content = json.dumps({"type": "FeatureCollection", "features": features}).encode()
+        files = {'file': (filepath, content, 'application/geo+json')}
+        response = self.session.post(f"{self.base_url}/import/geojson", files=files)
+        response.raise_for_status()
+        return response.json()
+    
+    @staticmethod
+    def _add_import_result(totals: dict, result: dict):
+        """Add one chunk's import counts to the running totals"""
+        for key in ("imported", "updated", "total_features"):
+            totals[key] += result.get(key, 0)
+        totals["chunks"] += 1
     
     def import_spatialite(self, filepath: str, table_name: str = "building", 
                          id_column: str = "marking_pg_id", geom_column: str = "geom") -> dict:
@@ -35,8 +134,8 @@ class BlitzFindCLI:
                     'id_column': id_column,
                     'geom_column': geom_column
                 }
-                response = requests.post(f"{self.base_url}/import/spatialite", 
-                                       files=files, params=params)
+                response = self.session.post(f"{self.base_url}/import/spatialite", 
+                                             files=files, params=params)
                 response.raise_for_status()
                 return response.json()
         except Exception as e:
@@ -45,7 +144,7 @@ class BlitzFindCLI:
     def query(self, id: str) -> dict:
         """Query value by ID"""
         try:
-            response = requests.get(f"{self.base_url}/query/{id}")
+            response = self.session.get(f"{self.base_url}/query/{id}")
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -55,7 +154,7 @@ class BlitzFindCLI:
         """Set a key-value pair"""
         try:
             data = {"id": id, "value": value}
-            response = requests.post(f"{self.base_url}/data", json=data)
+            response = self.session.post(f"{self.base_url}/data", json=data)
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -64,7 +163,7 @@ class BlitzFindCLI:
     def delete(self, id: str) -> dict:
         """Delete a key-value pair"""
         try:
-            response = requests.delete(f"{self.base_url}/data/{id}")
+            response = self.session.delete(f"{self.base_url}/data/{id}")
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -73,7 +172,7 @@ class BlitzFindCLI:
     def list_keys(self, skip: int = 0, limit: int = 100) -> dict:
         """List all keys"""
         try:
-            response = requests.get(f"{self.base_url}/data", params={"skip": skip, "limit": limit})
+            response = self.session.get(f"{self.base_url}/data", params={"skip": skip, "limit": limit})
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -88,6 +187,8 @@ def main():
     # Import command
     import_parser = subparsers.add_parser('import', help='Import GeoJSON file')
     import_parser.add_argument('file', help='Path to GeoJSON file')
+    import_parser.add_argument('--chunk-size', type=int, default=10000, help='Features per upload (default: 10000)')
+    import_parser.add_argument('--workers', type=int, default=4, help='Concurrent uploads (default: 4)')
     
     # Import SpatiaLite command
     import_spatialite_parser = subparsers.add_parser('import-spatialite', help='Import SpatiaLite database')
@@ -124,7 +225,7 @@ def main():
     
     # Execute command
     if args.command == 'import':
-        result = cli.import_geojson(args.file)
+        result = cli.import_geojson(args.file, args.chunk_size, args.workers)
     elif args.command == 'import-spatialite':
         result = cli.import_spatialite(args.file, args.table, args.id_column, args.geom_column)
     elif args.command == 'query':
@@ -6,8 +6,157 @@ to process SpatiaLite files instead of SQLAlchemy
 
 import sqlite3
 import json
+import orjson
+import numpy as np
+import shapely
+from shapely.geometry import mapping
 import tempfile
 import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+SPATIALITE_EXTENSION_PATHS = (
+    'mod_spatialite',  # Default
+    '/opt/homebrew/lib/mod_spatialite',  # Homebrew on macOS ARM
+    '/usr/local/lib/mod_spatialite',  # Homebrew on macOS Intel
+    '/usr/lib/x86_64-linux-gnu/mod_spatialite',  # Ubuntu/Debian
+    '/usr/lib64/mod_spatialite',  # RHEL/CentOS
+)
+
+# Extension path that loaded last time, tried first on later calls
+_SPATIALITE_PATH: Optional[str] = None
+
+def _extension_file_exists(ext_path):
+    """Return False for absolute paths with no matching library file on disk"""
+    if not os.path.isabs(ext_path):
+        return True
+    return any(os.path.exists(ext_path + suffix) for suffix in ("", ".so", ".dylib"))
+
+def load_spatialite(conn):
+    """Load the SpatiaLite extension into conn, returning True on success"""
+    global _SPATIALITE_PATH
+    
+    # Enable extension loading
+    try:
+        conn.enable_load_extension(True)
+    except AttributeError:
+        # Python's sqlite3 was built without extension loading support
+        return False
+    
+    candidates = SPATIALITE_EXTENSION_PATHS
+    if _SPATIALITE_PATH is not None:
+        candidates = (_SPATIALITE_PATH,) + tuple(p for p in candidates if p != _SPATIALITE_PATH)
+    
+    for ext_path in candidates:
+        if not _extension_file_exists(ext_path):
+            continue
+        try:
+            conn.execute("SELECT load_extension(?)", (ext_path,))
+        except sqlite3.OperationalError:
+            continue
+        if ext_path != _SPATIALITE_PATH:
+            print(f"Successfully loaded SpatiaLite extension from: {ext_path}")
+            _SPATIALITE_PATH = ext_path
+        return True
+    return False
+
+# Most connections kept open at once; the least recently used one is closed beyond this
+MAX_CACHED_CONNECTIONS = 32
+
+class _CachedConnection:
+    """A reusable connection to one database file, plus what was learned when opening it"""
+    
+    def __init__(self, conn, identity, is_spatialite):
+        self.conn = conn
+        # (st_dev, st_ino, st_mtime_ns, st_size) of the file when it was opened
+        self.identity = identity
+        self.is_spatialite = is_spatialite
+        # sqlite3 connections are not thread-safe; guards every call on conn
+        self.lock = threading.Lock()
+        # Generators currently reading through conn; it is closed once this drops to 0
+        self.users = 0
+        self.evicted = False
+
+# Open connections by path, least recently used first; guarded by _CACHE_LOCK
+_CONNECTIONS = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+def _file_identity(db_path):
+    """Return what identifies the file at db_path, so a replaced file is not served from cache"""
+    st = os.stat(db_path)
+    return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+
+def _open_conn(db_path, identity):
+    """Open db_path and load SpatiaLite if the file needs it"""
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    
+    # Check if it's a SpatiaLite database
+    is_spatialite = False
+    try:
+        if conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='spatial_ref_sys'").fetchone():
+            is_spatialite = True
+            print(f"Detected SpatiaLite database")
+    except sqlite3.Error:
+        pass
+    
+    # Try to load SpatiaLite extension
+    if is_spatialite and not load_spatialite(conn):
+        # If extension loading fails, treat as regular SQLite
+        is_spatialite = False
+        print("Failed to load SpatiaLite extension, treating as regular SQLite")
+    
+    return _CachedConnection(conn, identity, is_spatialite)
+
+def _evict(entry):
+    """Forget entry and close its connection now, or when its last user releases it"""
+    entry.evicted = True
+    if entry.users == 0:
+        entry.conn.close()
+
+def _acquire_conn(db_path):
+    """
+    Return the cached connection for db_path, opening it if needed
+    
+    The file is re-stat'ed on every call; if it was replaced or modified since
+    the connection was opened, the old connection is dropped and a new one opened.
+    Callers must pass the result to _release_conn when done.
+    """
+    identity = _file_identity(db_path)
+    with _CACHE_LOCK:
+        entry = _CONNECTIONS.get(db_path)
+        if entry is not None and entry.identity != identity:
+            _evict(_CONNECTIONS.pop(db_path))
+            entry = None
+        if entry is None:
+            entry = _open_conn(db_path, identity)
+            _CONNECTIONS[db_path] = entry
+            while len(_CONNECTIONS) > MAX_CACHED_CONNECTIONS:
+                _evict(_CONNECTIONS.popitem(last=False)[1])
+        else:
+            _CONNECTIONS.move_to_end(db_path)
+        entry.users += 1
+        return entry
+
+def _release_conn(entry):
+    """Give back a connection from _acquire_conn, closing it if it was evicted meanwhile"""
+    with _CACHE_LOCK:
+        entry.users -= 1
+        if entry.evicted and entry.users == 0:
+            entry.conn.close()
+
+def drop_cached_connection(db_path):
+    """Close the cached connection to db_path, e.g. before deleting the file"""
+    with _CACHE_LOCK:
+        entry = _CONNECTIONS.pop(db_path, None)
+        if entry is not None:
+            _evict(entry)
+
+def close_cached_connections():
+    """Close every cached connection and empty the cache"""
+    with _CACHE_LOCK:
+        while _CONNECTIONS:
+            _evict(_CONNECTIONS.popitem()[1])
 
 def process_spatialite_with_sqlite3(db_path, table_name="building", id_column="marking_pg_id", geom_column="geom"):
     """
@@ -19,123 +168,173 @@ def process_spatialite_with_sqlite3(db_path, table_name="building", id_column="m
         id_column: Column to use as ID
         geom_column: Geometry column name
     
-    Returns:
-        List of GeoJSON features
+    Yields:
+        GeoJSON features, one per row
     """
-    features = []
-    
-    # Connect to the database
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row  # This allows column access by name
-    cursor = conn.cursor()
+    entry = _acquire_conn(db_path)
+    conn, lock, is_spatialite = entry.conn, entry.lock, entry.is_spatialite
     
+    # sqlite3 connections are not thread-safe, so every call on conn takes the lock;
+    # it is released before yielding so other readers of the same file are not blocked
+    cursor = None
     try:
-        # Check if it's a SpatiaLite database
-        is_spatialite = False
-        try:
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='spatial_ref_sys'")
-            if cursor.fetchone():
-                is_spatialite = True
-                print(f"Detected SpatiaLite database")
-        except:
-            pass
-        
-        # Build the query based on whether it's SpatiaLite or regular SQLite
-        if is_spatialite:
-            # Try to load SpatiaLite extension
-            spatialite_loaded = False
-            extension_paths = [
-                'mod_spatialite',  # Default
-                '/opt/homebrew/lib/mod_spatialite',  # Homebrew on macOS ARM
-                '/usr/local/lib/mod_spatialite',  # Homebrew on macOS Intel
-                '/usr/lib/x86_64-linux-gnu/mod_spatialite',  # Ubuntu/Debian
-                '/usr/lib64/mod_spatialite',  # RHEL/CentOS
-            ]
-            
-            # Enable extension loading
-            conn.enable_load_extension(True)
+        with lock:
+            cursor = conn.cursor()
             
-            for ext_path in extension_paths:
-                try:
-                    cursor.execute(f"SELECT load_extension('{ext_path}')")
-                    spatialite_loaded = True
-                    print(f"Successfully loaded SpatiaLite extension from: {ext_path}")
-                    break
-                except Exception as e:
-                    continue
-            
-            if spatialite_loaded:
-                # Use AsGeoJSON for SpatiaLite
-                query = f"""
-                    SELECT 
-                        {id_column} as id,
-                        AsGeoJSON({geom_column}) as geometry_json,
-                        *
-                    FROM {table_name}
-                    WHERE {id_column} IS NOT NULL
-                """
+            # Build the query based on whether it's SpatiaLite or regular SQLite
+            if is_spatialite:
+                # Fetch compact WKB for SpatiaLite; GEOS decodes it in one pass instead
+                # of SQLite writing GeoJSON text that Python then parses again
+                geometry_select = f"AsBinary({geom_column})"
             else:
-                # If extension loading fails, treat as regular SQLite
-                is_spatialite = False
-                print("Failed to load SpatiaLite extension, treating as regular SQLite")
-        
-        if not is_spatialite:
-            # For regular SQLite, assume geometry is already stored as GeoJSON string
+                # For regular SQLite, assume geometry is already stored as GeoJSON string
+                geometry_select = geom_column
+            
+            # Select each property column once by name instead of appending *
+            cursor.execute(f"PRAGMA table_info({table_name})")
+            prop_cols = [c[1] for c in cursor.fetchall() if c[1] not in (id_column, geom_column)]
+            select_list = ", ".join([id_column, geometry_select] + prop_cols)
             query = f"""
-                SELECT 
-                    {id_column} as id,
-                    {geom_column} as geometry_json,
-                    *
+                SELECT {select_list}
                 FROM {table_name}
                 WHERE {id_column} IS NOT NULL
             """
-        
-        # Execute query
-        print(f"Executing query: {query}")
-        cursor.execute(query)
-        
-        # Process each row
-        for row in cursor:
-            # Convert sqlite3.Row to dict
-            row_dict = dict(row)
-            feature_id = str(row_dict['id'])
             
-            # Parse geometry
-            geometry = None
-            geometry_data = row_dict.get('geometry_json')
+            # Execute query
+            print(f"Executing query: {query}")
+            cursor.execute(query)
+            cursor.arraysize = 2048
+        
+        # Process rows in fetchmany batches
+        while True:
+            with lock:
+                rows = cursor.fetchmany()
+            if not rows:
+                break
+            if is_spatialite:
+                # Decode the whole batch's WKB in one vectorized GEOS call; invalid WKB
+                # comes back as None. mapping() keeps Z coordinates, which
+                # shapely.to_geojson drops on GEOS < 3.12.
+                wkbs = np.array([row[1] for row in rows], dtype=object)
+                geometries = [mapping(g) if g is not None else None
+                              for g in shapely.from_wkb(wkbs, on_invalid="ignore")]
+            else:
+                geometries = [row[1] for row in rows]
             
-            if geometry_data:
-                if isinstance(geometry_data, str):
+            for (fid, geometry_data, *vals), geometry in zip(rows, geometries):
+                feature_id = str(fid)
+                
+                # Parse geometry; regular SQLite stores it as GeoJSON text
+                if not is_spatialite:
                     try:
-                        # Try to parse as JSON
-                        geometry = json.loads(geometry_data)
-                    except json.JSONDecodeError:
-                        # If it's not valid JSON, skip this geometry
-                        print(f"Warning: Could not parse geometry for ID {feature_id}")
+                        geometry = orjson.loads(geometry) if geometry else None
+                    except (orjson.JSONDecodeError, TypeError):
                         geometry = None
-                elif isinstance(geometry_data, dict):
-                    geometry = geometry_data
-            
-            # Remove special columns from properties
-            properties = {k: v for k, v in row_dict.items() 
-                        if k not in ['id', 'geometry_json', geom_column] and v is not None}
-            
-            # Create GeoJSON feature
-            feature = {
-                "type": "Feature",
-                "id": feature_id,
-                "geometry": geometry,
-                "properties": properties
-            }
-            
-            features.append(feature)
-            print(f"Processed feature: {feature_id}")
-    
+                if geometry is None and geometry_data:
+                    # If it's not valid WKB/JSON, skip this geometry
+                    print(f"Warning: Could not parse geometry for ID {feature_id}")
+                
+                # Pair property values with their column names
+                properties = {k: v for k, v in zip(prop_cols, vals) if v is not None}
+                
+                # Create GeoJSON feature
+                feature = {
+                    "type": "Feature",
+                    "id": feature_id,
+                    "geometry": geometry,
+                    "properties": properties
+                }
+                
+                print(f"Processed feature: {feature_id}")
+                yield feature
     finally:
-        # Close the connection
-        conn.close()
+        if cursor is not None:
+            with lock:
+                cursor.close()
+        _release_conn(entry)
+
+def write_geojson_stream(db_path, out_fp, **kwargs):
+    """
+    Stream a SpatiaLite table to a binary file object as a GeoJSON FeatureCollection
+    
+    Args:
+        db_path: Path to the SpatiaLite database file
+        out_fp: Binary file object to write to
+        **kwargs: Passed through to process_spatialite_with_sqlite3
     
-    return features
+    Returns:
+        Number of features written
+    """
+    count = 0
+    out_fp.write(b'{"type":"FeatureCollection","features":[')
+    for feature in process_spatialite_with_sqlite3(db_path, **kwargs):
+        if count:
+            out_fp.write(b',')
+        out_fp.write(orjson.dumps(feature))
+        count += 1
+    out_fp.write(b']}')
+    return count
+
+# Sample building table, SQL and rows shared by every call (geometries serialized once at import)
+_CREATE_BUILDING_SQL = '''
+    CREATE TABLE IF NOT EXISTS building (
+        marking_pg_id TEXT,
+        struct_id TEXT,
+        aoi_id TEXT,
+        poi_id TEXT,
+        mesh_id TEXT,
+        centre_point TEXT,
+        address TEXT,
+        describe REAL,
+        name_ch TEXT,
+        dsm_max REAL,
+        dem_min REAL,
+        geom TEXT
+    )
+'''
+
+_INSERT_BUILDING_SQL = '''
+    INSERT INTO building (
+        marking_pg_id, struct_id, aoi_id, poi_id, mesh_id,
+        centre_point, address, describe, name_ch, dsm_max, dem_min, geom
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+_SAMPLE_GEOMETRIES = (
+    orjson.dumps({"type": "Polygon", "coordinates": [[[121.5, 31.2], [121.51, 31.2], [121.51, 31.21], [121.5, 31.21], [121.5, 31.2]]]}).decode(),
+    orjson.dumps({"type": "Polygon", "coordinates": [[[121.52, 31.22], [121.53, 31.22], [121.53, 31.23], [121.52, 31.23], [121.52, 31.22]]]}).decode()
+)
+
+_SAMPLE_ROWS = (
+    (
+        'BLD001',
+        'STRUCT001',
+        'AOI001',
+        'POI001',
+        'MESH001',
+        'POINT(121.5 31.2)',
+        '123 Main Street',
+        100.5,
+        '主楼',
+        50.0,
+        10.0,
+        _SAMPLE_GEOMETRIES[0]
+    ),
+    (
+        'BLD002',
+        'STRUCT002',
+        'AOI001',
+        'POI002',
+        'MESH001',
+        'POINT(121.52 31.22)',
+        '456 Second Avenue',
+        80.3,
+        '副楼',
+        45.0,
+        12.0,
+        _SAMPLE_GEOMETRIES[1]
+    ),
+)
 
 def create_sample_spatialite_db():
     """Create a sample SpatiaLite database for demonstration"""
@@ -144,73 +343,26 @@ def create_sample_spatialite_db():
         db_path = f.name
     
     # Connect to the database
-    conn = sqlite3.connect(db_path)
+    # isolation_level=None: transactions are managed explicitly below
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    # Bulk-load settings: no journal and no fsync. Only safe because this is a
+    # throwaway temp file; page_size must be set before the schema is created.
+    conn.execute("PRAGMA page_size=65536")
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA locking_mode=EXCLUSIVE")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-262144")
+    conn.execute("PRAGMA mmap_size=268435456")
     cursor = conn.cursor()
     
     # Create the building table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS building (
-            marking_pg_id TEXT,
-            struct_id TEXT,
-            aoi_id TEXT,
-            poi_id TEXT,
-            mesh_id TEXT,
-            centre_point TEXT,
-            address TEXT,
-            describe REAL,
-            name_ch TEXT,
-            dsm_max REAL,
-            dem_min REAL,
-            geom TEXT
-        )
-    ''')
-    
-    # Insert sample data with GeoJSON geometry
-    sample_data = [
-        (
-            'BLD001',
-            'STRUCT001',
-            'AOI001',
-            'POI001',
-            'MESH001',
-            'POINT(121.5 31.2)',
-            '123 Main Street',
-            100.5,
-            '主楼',
-            50.0,
-            10.0,
-            json.dumps({
-                "type": "Polygon",
-                "coordinates": [[[121.5, 31.2], [121.51, 31.2], [121.51, 31.21], [121.5, 31.21], [121.5, 31.2]]]
-            })
-        ),
-        (
-            'BLD002',
-            'STRUCT002',
-            'AOI001',
-            'POI002',
-            'MESH001',
-            'POINT(121.52 31.22)',
-            '456 Second Avenue',
-            80.3,
-            '副楼',
-            45.0,
-            12.0,
-            json.dumps({
-                "type": "Polygon",
-                "coordinates": [[[121.52, 31.22], [121.53, 31.22], [121.53, 31.23], [121.52, 31.23], [121.52, 31.22]]]
-            })
-        ),
-    ]
-    
-    cursor.executemany('''
-        INSERT INTO building (
-            marking_pg_id, struct_id, aoi_id, poi_id, mesh_id,
-            centre_point, address, describe, name_ch, dsm_max, dem_min, geom
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', sample_data)
-    
-    conn.commit()
+    cursor.execute(_CREATE_BUILDING_SQL)
+    
+    # Insert all rows through one prepared statement inside one explicit transaction
+    conn.execute("BEGIN")
+    conn.executemany(_INSERT_BUILDING_SQL, _SAMPLE_ROWS)
+    conn.execute("COMMIT")
     conn.close()
     
     return db_path
@@ -227,17 +379,19 @@ if __name__ == "__main__":
     try:
         # Process the database
         print("\nProcessing SpatiaLite database with sqlite3...")
-        features = process_spatialite_with_sqlite3(db_path)
-        
-        # Display results
-        print(f"\nProcessed {len(features)} features:")
-        for feature in features:
+        count = 0
+        for feature in process_spatialite_with_sqlite3(db_path):
+            count += 1
             print(f"\nFeature ID: {feature['id']}")
             print(f"  Geometry Type: {feature['geometry']['type'] if feature['geometry'] else 'None'}")
             print(f"  Properties: {json.dumps(feature['properties'], indent=4)}")
+        
+        # Display results
+        print(f"\nProcessed {count} features")
     
     finally:
         # Clean up
+        drop_cached_connection(db_path)
         if os.path.exists(db_path):
             os.unlink(db_path)
             print(f"\nCleaned up temporary database: {db_path}")
\ No newline at end of file
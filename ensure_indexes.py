@@ -6,6 +6,20 @@ Script to ensure database indexes are properly created for optimal performance
 from sqlalchemy import create_engine, text, inspect
 import os
 
+# Per-connection PRAGMAs (cache_size, temp_store, mmap_size) are applied by the
+# connect hook in app.py; only the persistent journal mode is set here.
+SQLITE_INDEXES = (
+    # Index on id column (should already exist as primary key)
+    "CREATE INDEX IF NOT EXISTS ix_key_value_store_id ON key_value_store(id)",
+    # Indexes on created_at/updated_at for potential time-based queries
+    "CREATE INDEX IF NOT EXISTS ix_key_value_store_created_at ON key_value_store(created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_key_value_store_updated_at ON key_value_store(updated_at)",
+    # Covering index so id listings read created_at/updated_at without touching the table
+    "CREATE INDEX IF NOT EXISTS ix_key_value_store_id_stamps ON key_value_store(id, created_at, updated_at)",
+    # Expression index for property lookups via /query_by_prop (JSON1 json_extract)
+    "CREATE INDEX IF NOT EXISTS ix_key_value_store_value_name ON key_value_store(json_extract(value, '$.properties.name'))",
+)
+
 def ensure_indexes():
     """Ensure all necessary indexes exist for optimal query performance"""
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./blitzfind.db")
@@ -16,34 +30,18 @@ def ensure_indexes():
         is_sqlite = DATABASE_URL.startswith("sqlite")
         
         if is_sqlite:
-            # SQLite-specific index creation
-            # Check existing indexes
-            result = conn.execute(text("SELECT name FROM sqlite_master WHERE type='index'"))
-            existing_indexes = [row[0] for row in result]
-            
-            # Create index on id column if not exists (should already exist as primary key)
-            if 'ix_key_value_store_id' not in existing_indexes:
-                print("Creating index on id column...")
-                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_key_value_store_id ON key_value_store(id)"))
-                conn.commit()
-            
-            # Create index on created_at for potential time-based queries
-            if 'ix_key_value_store_created_at' not in existing_indexes:
-                print("Creating index on created_at column...")
-                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_key_value_store_created_at ON key_value_store(created_at)"))
-                conn.commit()
-                
-            # Create index on updated_at for potential time-based queries
-            if 'ix_key_value_store_updated_at' not in existing_indexes:
-                print("Creating index on updated_at column...")
-                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_key_value_store_updated_at ON key_value_store(updated_at)"))
-                conn.commit()
-            
-            # Enable SQLite optimizations
+            # SQLite-specific index creation. IF NOT EXISTS makes a sqlite_master
+            # check redundant, and one explicit transaction means a single commit
+            # (one fsync) instead of one per index.
             conn.execute(text("PRAGMA journal_mode=WAL"))  # Write-Ahead Logging for better concurrency
             conn.execute(text("PRAGMA synchronous=NORMAL"))  # Faster writes
-            conn.execute(text("PRAGMA cache_size=10000"))  # Larger cache
-            conn.execute(text("PRAGMA temp_store=MEMORY"))  # Use memory for temp tables
+            
+            print("Ensuring SQLite indexes...")
+            conn.exec_driver_sql("BEGIN")
+            for statement in SQLITE_INDEXES:
+                conn.exec_driver_sql(statement)
+            # SQLite never gathers planner statistics on its own
+            conn.exec_driver_sql("ANALYZE key_value_store")
             conn.commit()
             
         else:
@@ -53,6 +51,9 @@ def ensure_indexes():
                 CREATE INDEX IF NOT EXISTS idx_key_value_store_id ON key_value_store(id);
                 CREATE INDEX IF NOT EXISTS idx_key_value_store_created_at ON key_value_store(created_at);
                 CREATE INDEX IF NOT EXISTS idx_key_value_store_updated_at ON key_value_store(updated_at);
+                CREATE INDEX IF NOT EXISTS idx_key_value_store_value_name ON key_value_store(((value::jsonb) #>> '{properties,name}'));
+                CREATE INDEX IF NOT EXISTS idx_key_value_store_id_stamps ON key_value_store(id) INCLUDE (created_at, updated_at);
+                ANALYZE key_value_store;
             """))
             conn.commit()
         
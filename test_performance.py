@@ -6,26 +6,28 @@ Performance testing script to measure /data/{id} endpoint performance
 import asyncio
 import aiohttp
 import time
-import statistics
+import numpy as np
 from typing import List
-import json
+import orjson
 
-async def fetch_data(session: aiohttp.ClientSession, base_url: str, item_id: str) -> float:
-    """Fetch a single item and return response time"""
-    start_time = time.time()
+async def fetch_data(session: aiohttp.ClientSession, base_url: str, item_id: str) -> int:
+    """Fetch a single item and return response time in nanoseconds"""
+    start_ns = time.perf_counter_ns()
     try:
         async with session.get(f"{base_url}/data/{item_id}") as response:
-            await response.json()
-            return time.time() - start_time
+            orjson.loads(await response.read())
+            return time.perf_counter_ns() - start_ns
     except Exception as e:
         print(f"Error fetching {item_id}: {e}")
         return -1
 
-async def create_test_data(session: aiohttp.ClientSession, base_url: str, num_items: int):
-    """Create test data items"""
+async def create_test_data(session: aiohttp.ClientSession, base_url: str, num_items: int,
+                           sem: asyncio.Semaphore):
+    """Create test data items concurrently, at most sem's limit in flight"""
     print(f"Creating {num_items} test items...")
-    for i in range(num_items):
-        data = {
+    # Serialize every body once up front so aiohttp posts raw bytes
+    bodies = [
+        orjson.dumps({
             "id": f"test_item_{i}",
             "value": {
                 "name": f"Test Item {i}",
@@ -36,10 +38,20 @@ async def create_test_data(session: aiohttp.ClientSession, base_url: str, num_it
                     "index": i
                 }
             }
-        }
-        async with session.post(f"{base_url}/data", json=data) as response:
-            if response.status != 200:
-                print(f"Failed to create item {i}: {response.status}")
+        })
+        for i in range(num_items)
+    ]
+    headers = {"Content-Type": "application/json"}
+    
+    async def _post(body: bytes) -> int:
+        async with sem:
+            async with session.post(f"{base_url}/data", data=body, headers=headers) as response:
+                return response.status
+    
+    statuses = await asyncio.gather(*(_post(b) for b in bodies))
+    for i, status in enumerate(statuses):
+        if status != 200:
+            print(f"Failed to create item {i}: {status}")
 
 async def run_performance_test(base_url: str = "http://localhost:8000", 
                               num_items: int = 100, 
@@ -47,68 +59,86 @@ async def run_performance_test(base_url: str = "http://localhost:8000",
                               concurrent_requests: int = 10):
     """Run performance test with concurrent requests"""
     
-    async with aiohttp.ClientSession() as session:
+    connector = aiohttp.TCPConnector(
+        limit=concurrent_requests,
+        limit_per_host=concurrent_requests,
+        ttl_dns_cache=300,
+        keepalive_timeout=60,
+        enable_cleanup_closed=True,
+    )
+    async with aiohttp.ClientSession(connector=connector) as session:
+        # Keep concurrent_requests in flight without stalling at batch boundaries
+        sem = asyncio.Semaphore(concurrent_requests)
+        
         # Create test data
-        await create_test_data(session, base_url, num_items)
+        await create_test_data(session, base_url, num_items, sem)
         
         print(f"\nRunning performance test...")
         print(f"- Total requests: {num_requests}")
         print(f"- Concurrent requests: {concurrent_requests}")
         print(f"- Test items: {num_items}")
         
+        async def limited_fetch(item_id: str) -> int:
+            async with sem:
+                return await fetch_data(session, base_url, item_id)
+        
+        async def warmup_fetch() -> None:
+            async with sem:
+                async with session.get(f"{base_url}/") as response:
+                    await response.read()
+        
+        # Open the pooled connections first; the root endpoint is used so the
+        # warmup does not populate the data cache ahead of the uncached run
+        await asyncio.gather(*(warmup_fetch() for _ in range(10)))
+        
         # Prepare request tasks
         tasks = []
         for i in range(num_requests):
             item_id = f"test_item_{i % num_items}"  # Cycle through test items
-            tasks.append(fetch_data(session, base_url, item_id))
+            tasks.append(limited_fetch(item_id))
         
         # Run requests with concurrency limit
-        start_time = time.time()
-        response_times = []
-        
-        for i in range(0, len(tasks), concurrent_requests):
-            batch = tasks[i:i + concurrent_requests]
-            batch_results = await asyncio.gather(*batch)
-            response_times.extend([t for t in batch_results if t > 0])
+        start_ns = time.perf_counter_ns()
+        response_times = np.fromiter((t for t in await asyncio.gather(*tasks) if t > 0), dtype=np.int64)
         
-        total_time = time.time() - start_time
+        total_time = (time.perf_counter_ns() - start_ns) / 1e9
         
-        # Calculate statistics
-        if response_times:
-            avg_response_time = statistics.mean(response_times)
-            median_response_time = statistics.median(response_times)
-            p95_response_time = statistics.quantiles(response_times, n=20)[18]  # 95th percentile
-            p99_response_time = statistics.quantiles(response_times, n=100)[98]  # 99th percentile
-            min_response_time = min(response_times)
-            max_response_time = max(response_times)
+        # Calculate statistics (nanoseconds, converted to seconds for display)
+        if response_times.size:
+            avg_response_time = response_times.mean()
+            median_response_time, p95_response_time, p99_response_time = np.percentile(response_times, [50, 95, 99])
+            min_response_time = response_times.min()
+            max_response_time = response_times.max()
             
             print("\n=== Performance Test Results ===")
             print(f"Total test duration: {total_time:.2f} seconds")
             print(f"Successful requests: {len(response_times)}/{num_requests}")
             print(f"Requests per second: {len(response_times)/total_time:.2f}")
             print(f"\nResponse Time Statistics (seconds):")
-            print(f"  Average: {avg_response_time:.4f}")
-            print(f"  Median: {median_response_time:.4f}")
-            print(f"  Min: {min_response_time:.4f}")
-            print(f"  Max: {max_response_time:.4f}")
-            print(f"  95th percentile: {p95_response_time:.4f}")
-            print(f"  99th percentile: {p99_response_time:.4f}")
+            print(f"  Average: {avg_response_time / 1e9:.4f}")
+            print(f"  Median: {median_response_time / 1e9:.4f}")
+            print(f"  Min: {min_response_time / 1e9:.4f}")
+            print(f"  Max: {max_response_time / 1e9:.4f}")
+            print(f"  95th percentile: {p95_response_time / 1e9:.4f}")
+            print(f"  99th percentile: {p99_response_time / 1e9:.4f}")
             
             # Check cache effectiveness (second run should be faster)
             print("\n=== Testing Cache Effectiveness ===")
             print("Running second test (should hit cache)...")
             
-            cached_times = []
-            for i in range(min(50, num_requests)):
-                item_id = f"test_item_{i % num_items}"
-                response_time = await fetch_data(session, base_url, item_id)
-                if response_time > 0:
-                    cached_times.append(response_time)
+            num_cached = min(50, num_requests)
+            cached_tasks = [limited_fetch(f"test_item_{i % num_items}") for i in range(num_cached)]
+            cached_start_ns = time.perf_counter_ns()
+            cached_times = np.fromiter((t for t in await asyncio.gather(*cached_tasks) if t > 0), dtype=np.int64)
+            cached_total_time = (time.perf_counter_ns() - cached_start_ns) / 1e9
             
-            if cached_times:
-                avg_cached_time = statistics.mean(cached_times)
-                print(f"Average response time (cached): {avg_cached_time:.4f} seconds")
-                print(f"Cache speedup: {avg_response_time/avg_cached_time:.2f}x faster")
+            if cached_times.size:
+                rps = len(response_times) / total_time
+                cached_rps = len(cached_times) / cached_total_time
+                print(f"Median response time: {median_response_time / 1e9:.4f} seconds (uncached), "
+                      f"{np.median(cached_times) / 1e9:.4f} seconds (cached)")
+                print(f"Requests per second: {rps:.2f} (uncached), {cached_rps:.2f} (cached)")
+                print(f"Cache speedup: {cached_rps / rps:.2f}x higher throughput")
 
 if __name__ == "__main__":
     import sys
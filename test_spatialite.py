@@ -3,12 +3,90 @@
 Test script for SpatiaLite import functionality using Python's default sqlite3 library
 """
 
+import asyncio
+import httpx
 import requests
 import json
 import sqlite3
 import tempfile
 import os
 
+# Sample building table, SQL and rows shared by every call (geometries serialized once at import)
+_CREATE_BUILDING_SQL = '''
+    CREATE TABLE IF NOT EXISTS building (
+        marking_pg_id TEXT,
+        struct_id TEXT,
+        aoi_id TEXT,
+        poi_id TEXT,
+        mesh_id TEXT,
+        centre_point TEXT,
+        address TEXT,
+        describe REAL,
+        name_ch TEXT,
+        dsm_max REAL,
+        dem_min REAL,
+        geom TEXT
+    )
+'''
+
+_INSERT_BUILDING_SQL = '''
+    INSERT INTO building (
+        marking_pg_id, struct_id, aoi_id, poi_id, mesh_id,
+        centre_point, address, describe, name_ch, dsm_max, dem_min, geom
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+_SAMPLE_GEOMETRIES = (
+    json.dumps({"type": "Polygon", "coordinates": [[[121.5, 31.2], [121.51, 31.2], [121.51, 31.21], [121.5, 31.21], [121.5, 31.2]]]}),
+    json.dumps({"type": "Polygon", "coordinates": [[[121.52, 31.22], [121.53, 31.22], [121.53, 31.23], [121.52, 31.23], [121.52, 31.22]]]}),
+    json.dumps({"type": "Polygon", "coordinates": [[[121.54, 31.24], [121.55, 31.24], [121.55, 31.25], [121.54, 31.25], [121.54, 31.24]]]})
+)
+
+_SAMPLE_ROWS = (
+    (
+        'BLD001',
+        'STRUCT001',
+        'AOI001',
+        'POI001',
+        'MESH001',
+        'POINT(121.5 31.2)',
+        '123 Main Street',
+        100.5,
+        '主楼',
+        50.0,
+        10.0,
+        _SAMPLE_GEOMETRIES[0]
+    ),
+    (
+        'BLD002',
+        'STRUCT002',
+        'AOI001',
+        'POI002',
+        'MESH001',
+        'POINT(121.52 31.22)',
+        '456 Second Avenue',
+        80.3,
+        '副楼',
+        45.0,
+        12.0,
+        _SAMPLE_GEOMETRIES[1]
+    ),
+    (
+        'BLD003',
+        'STRUCT003',
+        'AOI002',
+        'POI003',
+        'MESH002',
+        'POINT(121.54 31.24)',
+        '789 Third Road',
+        120.7,
+        '办公楼',
+        60.0,
+        15.0,
+        _SAMPLE_GEOMETRIES[2]
+    ),
+)
+
 def create_sample_spatialite_db():
     """Create a sample SpatiaLite database for testing"""
     # Create a temporary database file
@@ -16,107 +94,37 @@ def create_sample_spatialite_db():
         db_path = f.name
     
     # Connect to the database
-    conn = sqlite3.connect(db_path)
+    # isolation_level=None: transactions are managed explicitly below
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    # Bulk-load settings: no journal and no fsync. Only safe because this is a
+    # throwaway temp file; page_size must be set before the schema is created.
+    conn.execute("PRAGMA page_size=65536")
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA locking_mode=EXCLUSIVE")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-262144")
+    conn.execute("PRAGMA mmap_size=268435456")
     cursor = conn.cursor()
     
     # Create the building table as specified
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS building (
-            marking_pg_id TEXT,
-            struct_id TEXT,
-            aoi_id TEXT,
-            poi_id TEXT,
-            mesh_id TEXT,
-            centre_point TEXT,
-            address TEXT,
-            describe REAL,
-            name_ch TEXT,
-            dsm_max REAL,
-            dem_min REAL,
-            geom TEXT
-        )
-    ''')
-    
-    # Insert sample data with GeoJSON geometry
-    sample_data = [
-        (
-            'BLD001',
-            'STRUCT001',
-            'AOI001',
-            'POI001',
-            'MESH001',
-            'POINT(121.5 31.2)',
-            '123 Main Street',
-            100.5,
-            '主楼',
-            50.0,
-            10.0,
-            json.dumps({
-                "type": "Polygon",
-                "coordinates": [[[121.5, 31.2], [121.51, 31.2], [121.51, 31.21], [121.5, 31.21], [121.5, 31.2]]]
-            })
-        ),
-        (
-            'BLD002',
-            'STRUCT002',
-            'AOI001',
-            'POI002',
-            'MESH001',
-            'POINT(121.52 31.22)',
-            '456 Second Avenue',
-            80.3,
-            '副楼',
-            45.0,
-            12.0,
-            json.dumps({
-                "type": "Polygon",
-                "coordinates": [[[121.52, 31.22], [121.53, 31.22], [121.53, 31.23], [121.52, 31.23], [121.52, 31.22]]]
-            })
-        ),
-        (
-            'BLD003',
-            'STRUCT003',
-            'AOI002',
-            'POI003',
-            'MESH002',
-            'POINT(121.54 31.24)',
-            '789 Third Road',
-            120.7,
-            '办公楼',
-            60.0,
-            15.0,
-            json.dumps({
-                "type": "Polygon",
-                "coordinates": [[[121.54, 31.24], [121.55, 31.24], [121.55, 31.25], [121.54, 31.25], [121.54, 31.24]]]
-            })
-        )
-    ]
-    
-    cursor.executemany('''
-        INSERT INTO building (
-            marking_pg_id, struct_id, aoi_id, poi_id, mesh_id,
-            centre_point, address, describe, name_ch, dsm_max, dem_min, geom
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', sample_data)
+    cursor.execute(_CREATE_BUILDING_SQL)
     
-    conn.commit()
+    # Insert all rows through one prepared statement inside one explicit transaction
+    conn.execute("BEGIN")
+    conn.executemany(_INSERT_BUILDING_SQL, _SAMPLE_ROWS)
+    conn.execute("COMMIT")
     conn.close()
     
     return db_path
 
-def test_spatialite_import():
-    """Test the SpatiaLite import functionality"""
-    print("Creating sample SpatiaLite database...")
-    db_path = create_sample_spatialite_db()
-    
-    try:
-        # Test import via API
-        print(f"\nImporting SpatiaLite database: {db_path}")
-        
+async def import_and_verify(db_path, building_ids):
+    """Import db_path through the API, then query every building concurrently"""
+    async with httpx.AsyncClient(base_url='http://localhost:8000') as client:
         with open(db_path, 'rb') as f:
             files = {'file': ('test_building.sqlite', f, 'application/octet-stream')}
-            response = requests.post(
-                'http://localhost:8000/import/spatialite',
+            response = await client.post(
+                '/import/spatialite',
                 files=files,
                 params={
                     'table_name': 'building',
@@ -125,6 +133,25 @@ def test_spatialite_import():
                 }
             )
         
+        if response.status_code != 200:
+            return response, []
+        
+        query_responses = await asyncio.gather(
+            *(client.get(f'/query/{building_id}') for building_id in building_ids)
+        )
+        return response, query_responses
+
+def test_spatialite_import():
+    """Test the SpatiaLite import functionality"""
+    print("Creating sample SpatiaLite database...")
+    db_path = create_sample_spatialite_db()
+    building_ids = ['BLD001', 'BLD002', 'BLD003']
+    
+    try:
+        # Test import via API
+        print(f"\nImporting SpatiaLite database: {db_path}")
+        response, query_responses = asyncio.run(import_and_verify(db_path, building_ids))
+        
         if response.status_code == 200:
             result = response.json()
             print("\nImport successful!")
@@ -132,8 +159,7 @@ def test_spatialite_import():
             
             # Test querying the imported data
             print("\nQuerying imported data...")
-            for building_id in ['BLD001', 'BLD002', 'BLD003']:
-                query_response = requests.get(f'http://localhost:8000/query/{building_id}')
+            for building_id, query_response in zip(building_ids, query_responses):
                 if query_response.status_code == 200:
                     data = query_response.json()
                     if data['found']: